@@ -3,17 +3,8 @@
 
 import pygame
 from chess_backend.constants import *
-from chess_backend.ChessEngine import GameState, Move, castle_rights
-
-pygame.display.set_caption("Chess")
-
-# Initialise a global dictionary of images - This will be called exactly once
-# in the main
-
-def load_Images():
-    pieces = ["wp", "wR", "wN", "wB", "wQ", "wK", "bp", "bR", "bN", "bB", "bQ", "bK"]
-    for piece in pieces:
-        IMAGES[piece] = pygame.transform.scale(pygame.image.load("images_chess/set_1/" + piece + ".png"), (SQ_SIZE, SQ_SIZE))
+from chess_backend.ChessEngine import GameState, Move
+from chess_backend.images import piece_image
 
 def get_row_col_from_mouse(pos):
     x, y = pos
@@ -34,7 +25,6 @@ def main():
     validMoves = gs.valid_moves()
     movesMade = False # flag variable for when a move is made
     animate = False
-    load_Images()
     running = True
     sqSelected = () # keeps track of last click of the user (tuple: (row, col))
     playerClicks = []
@@ -143,7 +133,7 @@ def DrawPieces(screen, board):
         for c in range(DIMENSION):
             piece = board[r][c]
             if piece != "--":
-                screen.blit(IMAGES[piece], pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+                screen.blit(piece_image(piece, SQ_SIZE), pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
 
 def animateMove(move, screen, board, clock):
     colors = [WHITE, GRAY]
@@ -162,9 +152,9 @@ def animateMove(move, screen, board, clock):
         pygame.draw.rect(screen, color, endSquare)
         # draw captured piece onto rectangle
         if move.captured_piece != '--':
-            screen.blit(IMAGES[move.captured_piece], endSquare)
+            screen.blit(piece_image(move.captured_piece, SQ_SIZE), endSquare)
         # draw moving piece
-        screen.blit(IMAGES[move.moved_piece], pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+        screen.blit(piece_image(move.moved_piece, SQ_SIZE), pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
         pygame.display.flip()
         clock.tick(60)
 
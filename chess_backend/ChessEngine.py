@@ -1,94 +1,190 @@
 # This class is responsible for storing all the information about the current state of the chess game.  It will also be responeble
 # for determining the valid moves at the current state.  It will also keep a move log.
 
+# Pieces are stored on the board as one byte each, an index into PIECE_NAMES.  0 is an empty square.
+PIECE_NAMES = ("--", "wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+PIECE_CODES = {name: code for code, name in enumerate(PIECE_NAMES)}
+
+START_BOARD = bytes(PIECE_CODES[piece] for piece in
+                    ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"] + ["bp"] * 8 + ["--"] * 32 +
+                    ["wp"] * 8 + ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"])
+
+# Bits of GameState._flags
+WHITE_TO_MOVE = 1
+WKS_CASTLE = 2
+WQS_CASTLE = 4
+BKS_CASTLE = 8
+BQS_CASTLE = 16
+IN_CHECK = 32
+CHECKMATE = 64
+STALEMATE = 128
+CASTLE_FLAGS = WKS_CASTLE | WQS_CASTLE | BKS_CASTLE | BQS_CASTLE
+
+
+# Property reading and writing one bit of GameState._flags
+def _flag(bit):
+    def get(self):
+        return bool(self._flags & bit)
+    def set(self, value):
+        self._flags = self._flags | bit if value else self._flags & ~bit
+    return property(get, set)
+
+
+# Read only view of the board, indexed like the old list of lists: board[row][column] is a 2 character piece name
+class BoardView():
+    __slots__ = ("_squares",)
+
+    def __init__(self, squares):
+        self._squares = squares
+
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, r):
+        if not 0 <= r < 8:
+            raise IndexError("board row out of range")
+        return BoardRow(self._squares, r * 8)
+
+    def __repr__(self):
+        return "BoardView(%r)" % [list(row) for row in self]
+
+# Read only view of one row of the board
+class BoardRow():
+    __slots__ = ("_squares", "_start")
+
+    def __init__(self, squares, start):
+        self._squares = squares
+        self._start = start
+
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, c):
+        if not 0 <= c < 8:
+            raise IndexError("board column out of range")
+        return PIECE_NAMES[self._squares[self._start + c]]
+
+
 class GameState():
 
+    __slots__ = ("_squares", "_flags", "en_passant_possible", "moveLog", "castle_rightsLog", "pos_white_king",
+                 "pos_black_king", "pins", "checks")
+
     def __init__(self):
-        # Board is 8 by 8, 2 dimensional list.  Each element of the list has 2 characters.  The first character represents the color of the piece, and
+        # Board is 8 by 8, stored row by row in a bytearray of piece codes.  gs.board gives a read only view of it where
+        # each element has 2 characters.  The first character represents the color of the piece, and
         # second character represents the type of the piece. The string "--" represents an empty space.
-        self.board = [
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bp" for i in range(8)],
-            ["--" for i in range(8)],
-            ["--" for i in range(8)],
-            ["--" for i in range(8)],
-            ["--" for i in range(8)],
-            ["wp" for i in range(8)],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
-        ]
-
-        self.moveFunctions = {'p': self.pawn_moves, 'R': self.rook_moves, 'N': self.knight_moves,
-                            'B': self.bishop_moves, 'Q': self.queen_moves, 'K': self.king_moves}
-        
-        self.white_to_move = True
+        self._squares = bytearray(START_BOARD)
+        self._flags = WHITE_TO_MOVE | CASTLE_FLAGS # side to move, castling rights and game over flags packed in one int
+        self.en_passant_possible = () # coordinates for where an en passant is possible
         self.moveLog = []
         self.pos_white_king = (7, 4)
         self.pos_black_king = (0, 4)
-        self.in_check = False
         self.pins = []
         self.checks = []
-        self.checkmate = False
-        self.stalemate = False
-        self.en_passant_possible = () # coordinates for where an en passant is possible
-        self.wks_castle = True
-        self.wqs_castle = True
-        self.bks_castle = True
-        self.bqs_castle = True
-        self.castle_rightsLog = [castle_rights(self.wks_castle, self.wqs_castle, self.bks_castle, self.bqs_castle)]
+        self.castle_rightsLog = [self._flags & CASTLE_FLAGS]
+
+    white_to_move = _flag(WHITE_TO_MOVE)
+    in_check = _flag(IN_CHECK)
+    checkmate = _flag(CHECKMATE)
+    stalemate = _flag(STALEMATE)
+    wks_castle = _flag(WKS_CASTLE)
+    wqs_castle = _flag(WQS_CASTLE)
+    bks_castle = _flag(BKS_CASTLE)
+    bqs_castle = _flag(BQS_CASTLE)
+
+    @property
+    def board(self):
+        return BoardView(self._squares)
+
+    # Board decoded into a list of lists for the move generators.  valid_moves decodes it once and passes it down, the
+    # generators only decode it themselves when they are called on their own.
+    def _decoded_board(self):
+        return [[PIECE_NAMES[code] for code in self._squares[i:i + 8]] for i in range(0, 64, 8)]
+
+    def piece_at(self, r, c):
+        return PIECE_NAMES[self._squares[r * 8 + c]]
+
+    def set_piece(self, r, c, piece):
+        self._squares[r * 8 + c] = PIECE_CODES[piece]
+
+    # Everything needed to rebuild this state later.  The board is copied into 64 bytes, the logs are shared tuples.
+    def snapshot(self):
+        return (bytes(self._squares), self._flags, self.en_passant_possible, self.pos_white_king, self.pos_black_king,
+                tuple(self.moveLog), tuple(self.castle_rightsLog))
+
+    # Go back to a state returned by snapshot
+    def restore(self, snapshot):
+        squares, self._flags, self.en_passant_possible, self.pos_white_king, self.pos_black_king, moveLog, castle_rightsLog = snapshot
+        self._squares = bytearray(squares)
+        self.moveLog = list(moveLog)
+        self.castle_rightsLog = list(castle_rightsLog)
+        self.pins = []
+        self.checks = []
+
+    def copy(self):
+        gs = GameState.__new__(GameState)
+        gs.restore(self.snapshot())
+        return gs
+
+    __copy__ = copy
+    __getstate__ = snapshot
+    __setstate__ = restore
 
 
-    
     # Takes a move as a parameter and executes it.
     def makeMove(self, move):
-        self.board[move.start_row][move.start_column] = "--"
-        self.board[move.end_row][move.end_column] = move.moved_piece
+        self.set_piece(move.start_row, move.start_column, "--")
+        self.set_piece(move.end_row, move.end_column, move.moved_piece)
         self.moveLog.append(move) # log the move
-        self.white_to_move = not self.white_to_move
+        self._flags ^= WHITE_TO_MOVE
         # update the king's position if moved
         if move.moved_piece == "wK":
             self.pos_white_king = (move.end_row, move.end_column)
         elif move.moved_piece == "bK":
             self.pos_black_king = (move.end_row, move.end_column)
-        
+
         # en passant
         # if pawn moves twice, then next move can capture en passant
         if move.moved_piece[1] == 'p' and abs(move.start_row - move.end_row) == 2:
             self.en_passant_possible = ((move.end_row + move.start_row) // 2, move.end_column)
         else:
             self.en_passant_possible = ()
-        
+
         # if en passant move, then update the board to capture pawn
         if move.en_passant:
-            self.board[move.start_row][move.end_column] = '--'
-         
+            self.set_piece(move.start_row, move.end_column, '--')
+
         # pawn promotion
         if move.pawn_promotion:
-            promotedPiece = input("Promote to Q, R, B, N: ")
-            self.board[move.end_row][move.end_column] = move.moved_piece[0] + promotedPiece
-        
+            if move.promotion_choice is None: # ask the player unless the piece was already chosen (e.g. replaying a recorded game)
+                move.promotion_choice = input("Promote to Q, R, B, N: ")
+            promotedPiece = move.promotion_choice
+            self.set_piece(move.end_row, move.end_column, move.moved_piece[0] + promotedPiece)
+
         # castle moves
         if move.castle:
             if move.end_column - move.start_column == 2: # king side castle
-                self.board[move.end_row][move.end_column - 1] = self.board[move.end_row][move.end_column + 1] # moves the rook
-                self.board[move.end_row][move.end_column + 1] = '--'
+                self.set_piece(move.end_row, move.end_column - 1, self.piece_at(move.end_row, move.end_column + 1)) # moves the rook
+                self.set_piece(move.end_row, move.end_column + 1, '--')
             else:
-                self.board[move.end_row][move.end_column + 1] = self.board[move.end_row][move.end_column - 2]
-                self.board[move.end_row][move.end_column - 2] = '--'
+                self.set_piece(move.end_row, move.end_column + 1, self.piece_at(move.end_row, move.end_column - 2))
+                self.set_piece(move.end_row, move.end_column - 2, '--')
+
 
-        
         # updating castling rights
         self.update_castle_rights(move)
-        self.castle_rightsLog.append(castle_rights(self.wks_castle, self.wqs_castle, self.bks_castle, self.bqs_castle))
-        
-        
-    
+        self.castle_rightsLog.append(self._flags & CASTLE_FLAGS)
+
+
+
     # Undo the last move
     def undoMove(self):
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
-            self.board[move.start_row][move.start_column] = move.moved_piece
-            self.board[move.end_row][move.end_column] = move.captured_piece
-            self.white_to_move = not self.white_to_move
+            self.set_piece(move.start_row, move.start_column, move.moved_piece)
+            self.set_piece(move.end_row, move.end_column, move.captured_piece)
+            self._flags ^= WHITE_TO_MOVE
             # update the king's position if needed
             if move.moved_piece == "wK":
                 self.pos_white_king = (move.start_row, move.start_column)
@@ -96,8 +192,8 @@ class GameState():
                 self.pos_black_king = (move.start_row, move.start_column)
             # undo en passant
             if move.en_passant:
-                self.board[move.end_row][move.end_column] = "--" # removes pawn added in wrong square
-                self.board[move.start_row][move.end_column] = move.captured_piece # puts the pawn back to previous uncaptured square
+                self.set_piece(move.end_row, move.end_column, "--") # removes pawn added in wrong square
+                self.set_piece(move.start_row, move.end_column, move.captured_piece) # puts the pawn back to previous uncaptured square
                 self.en_passant_possible = (move.end_row, move.end_column) # allow en passant to happen next move
             # undo the two square pawn advance which would have made en passant possible
             if move.moved_piece[1] == 'p' and abs(move.start_row - move.end_row) == 2:
@@ -106,22 +202,19 @@ class GameState():
             # undo castle move
             if move.castle:
                 if move.end_column - move.start_column == 2: # king side
-                    self.board[move.end_row][move.end_column + 1] = self.board[move.end_row][move.end_column - 1]
-                    self.board[move.end_row][move.end_column - 1] = '--'
+                    self.set_piece(move.end_row, move.end_column + 1, self.piece_at(move.end_row, move.end_column - 1))
+                    self.set_piece(move.end_row, move.end_column - 1, '--')
                 else:
-                    self.board[move.end_row][move.end_column - 2] = self.board[move.end_row][move.end_column + 1]
-                    self.board[move.end_row][move.end_column + 1] = '--'
+                    self.set_piece(move.end_row, move.end_column - 2, self.piece_at(move.end_row, move.end_column + 1))
+                    self.set_piece(move.end_row, move.end_column + 1, '--')
 
 
             # undo the castle rights
             self.castle_rightsLog.pop() # get rid of new castle rights from the move that we are undoing
-            castle_rights = self.castle_rightsLog[-1] # set current castle rights to the last one on the list
-            self.wks_castle = castle_rights.wks
-            self.wqs_castle = castle_rights.wqs
-            self.bks_castle = castle_rights.bks
-            self.bqs_castle = castle_rights.bqs
+            # set current castle rights to the last one on the list
+            self._flags = (self._flags & ~CASTLE_FLAGS) | self.castle_rightsLog[-1]
+
 
-    
     # Update castle rights
     def update_castle_rights(self, move):
         if move.moved_piece == 'wK':
@@ -145,22 +238,23 @@ class GameState():
 
     # Valid moves - all moves considering checks
     def valid_moves(self):
+        board = self._decoded_board() # decoded once here and passed to every generator below
         moves = []
-        self.in_check, self.pins, self.checks = self.check_pins_and_checks()
+        self.in_check, self.pins, self.checks = self.check_pins_and_checks(board)
         if self.white_to_move:
             king_row = self.pos_white_king[0]
             king_column = self.pos_white_king[1]
         else:
             king_row = self.pos_black_king[0]
             king_column = self.pos_black_king[1]
-        if self.in_check: 
+        if self.in_check:
             if len(self.checks) == 1: # Only one check, block check or move king
-                moves = self.all_moves()
+                moves = self.all_moves(board)
                 # to block check, move piece into one of the squares between the opposition piece and the king
                 check = self.checks[0]
                 check_row = check[0]
                 check_column = check[1]
-                piece_checking = self.board[check_row][check_column]
+                piece_checking = board[check_row][check_column]
                 valid_squares = [] # squares that pieces can move to if the king is in check
                 if piece_checking[1] == "N":
                     valid_squares = [(check_row, check_column)]
@@ -175,13 +269,13 @@ class GameState():
                     if moves[i].moved_piece[1] != "K": # move doesn't move king so it must block or capture
                         if not (moves[i].end_row, moves[i].end_column) in valid_squares: # move doesn't block check or capture piece
                             moves.remove(moves[i])
-            
+
             else: # double check, king has to move
-                self.king_moves(king_row, king_column, moves)
-        
+                self.king_moves(king_row, king_column, moves, board)
+
         else: # not in check so all moves are good
-            moves = self.all_moves()
-        
+            moves = self.all_moves(board)
+
         if len(moves) == 0:
             if self.in_check:
                 self.checkmate = True
@@ -191,24 +285,28 @@ class GameState():
             self.checkmate = False
             self.stalemate = False
 
-    
+
         return moves
 
 
     # All moves - not considering checks
-    def all_moves(self):
+    def all_moves(self, board = None):
+        if board is None:
+            board = self._decoded_board()
         moves = []
-        for r in range(len(self.board)):
-            for c in range(len(self.board[r])):
-                turn = self.board[r][c][0]
-                if (turn == "w" and self.white_to_move) or (turn == "b" and not self.white_to_move):
-                    piece = self.board[r][c][1]
-                    self.moveFunctions[piece](r, c, moves)
-        
+        turn = "w" if self.white_to_move else "b"
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece[0] == turn:
+                    self.moveFunctions[piece[1]](self, r, c, moves, board)
+
         return moves
 
     # Get all pawn moves for pawn located in row, col.  Add these moves to list
-    def pawn_moves(self, r, c, moves):
+    def pawn_moves(self, r, c, moves, board = None):
+        if board is None:
+            board = self._decoded_board()
         pinned_piece = False
         pin_direction = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -217,57 +315,60 @@ class GameState():
                 pin_direction = (self.pins[i][2], self.pins[i][3])
                 self.pins.remove(self.pins[i])
                 break
-        
+
         if self.white_to_move:
             moveAmount = -1
             start_row = 6
             backRow = 0
             oppColor = 'b'
-        
+
         else:
             moveAmount = 1
             start_row = 1
             backRow = 7
             oppColor = 'w'
-        
+
         pawn_promotion = False
+        en_passant_possible = self.en_passant_possible
 
-        if self.board[r + moveAmount][c] == "--":
+        if board[r + moveAmount][c] == "--":
             if not pinned_piece or pin_direction == (moveAmount, 0):
                 if r + moveAmount == backRow:
                     pawn_promotion = True
-                moves.append(Move((r,c), (r + moveAmount,c), self.board, pawn_promotion = pawn_promotion))
-                if r == start_row and self.board[r + 2 * moveAmount][c] == "--":
-                    moves.append(Move((r,c), (r + 2 * moveAmount,c), self.board))
+                moves.append(Move((r,c), (r + moveAmount,c), board, pawn_promotion = pawn_promotion))
+                if r == start_row and board[r + 2 * moveAmount][c] == "--":
+                    moves.append(Move((r,c), (r + 2 * moveAmount,c), board))
 
         if c - 1 >= 0: # captures to the left
             if not pinned_piece or pin_direction == (moveAmount , -1):
-                if self.board[r + moveAmount][c - 1][0] == oppColor:
+                if board[r + moveAmount][c - 1][0] == oppColor:
                     if r + moveAmount == backRow:
                         pawn_promotion = True
-                    moves.append(Move((r,c), (r + moveAmount,c-1), self.board, pawn_promotion = pawn_promotion))
-                if (r + moveAmount, c - 1) == self.en_passant_possible:
-                    moves.append(Move((r,c), (r + moveAmount,c-1), self.board, en_passant = True))
-    
-        if c + 1 <= len(self.board) - 1: # captures to the right
+                    moves.append(Move((r,c), (r + moveAmount,c-1), board, pawn_promotion = pawn_promotion))
+                if (r + moveAmount, c - 1) == en_passant_possible:
+                    moves.append(Move((r,c), (r + moveAmount,c-1), board, en_passant = True))
+
+        if c + 1 <= 7: # captures to the right
             if not pinned_piece or pin_direction == (moveAmount , 1):
-                if self.board[r + moveAmount][c + 1][0] == oppColor:
+                if board[r + moveAmount][c + 1][0] == oppColor:
                     if r + moveAmount == backRow:
                         pawn_promotion = True
-                    moves.append(Move((r,c), (r + moveAmount,c+1), self.board, pawn_promotion = pawn_promotion))
-                if (r + moveAmount, c + 1) == self.en_passant_possible:
-                    moves.append(Move((r,c), (r + moveAmount,c+1), self.board, en_passant = True))
-        
+                    moves.append(Move((r,c), (r + moveAmount,c+1), board, pawn_promotion = pawn_promotion))
+                if (r + moveAmount, c + 1) == en_passant_possible:
+                    moves.append(Move((r,c), (r + moveAmount,c+1), board, en_passant = True))
+
 
     # Get all rook moves for rook located in row, col.  Add these moves to list
-    def rook_moves(self, r, c, moves):
+    def rook_moves(self, r, c, moves, board = None):
+        if board is None:
+            board = self._decoded_board()
         pinned_piece = False
         pin_direction = ()
         for i in range(len(self.pins) - 1, -1, -1):
             if self.pins[i][0] == r and self.pins[i][1] == c:
                 pinned_piece = True
                 pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[r][c][1] != "Q":
+                if board[r][c][1] != "Q":
                     self.pins.remove(self.pins[i])
                 break
 
@@ -279,18 +380,20 @@ class GameState():
                 end_column = c + d[1] * i
                 if 0 <= end_row < 8 and 0 <= end_column < 8: # on board
                     if not pinned_piece or pin_direction == d or pin_direction == (-d[0], -d[1]): # have to be able to move toward pin and away from pin
-                        endPiece = self.board[end_row][end_column]
+                        endPiece = board[end_row][end_column]
                         if endPiece == "--": # valid
-                            moves.append(Move((r, c), (end_row, end_column), self.board))
+                            moves.append(Move((r, c), (end_row, end_column), board))
                         elif endPiece[0] == opposingColor: # capture opposing piece
-                            moves.append(Move((r,c), (end_row, end_column), self.board))
+                            moves.append(Move((r,c), (end_row, end_column), board))
                             break
                         else: # friendly fire
                             break
                 else: # off board
                     break
 
-    def knight_moves(self, r, c, moves):
+    def knight_moves(self, r, c, moves, board = None):
+        if board is None:
+            board = self._decoded_board()
         pinned_piece = False
         for i in range(len(self.pins) - 1, -1, -1):
             if self.pins[i][0] == r and self.pins[i][1] == c:
@@ -305,13 +408,15 @@ class GameState():
             end_column = c + i[1]
             if 0 <= end_row < 8 and 0 <= end_column < 8:
                 if not pinned_piece:
-                    endPiece = self.board[end_row][end_column]
+                    endPiece = board[end_row][end_column]
                     if endPiece[0] != sameColor:
-                        moves.append(Move((r,c), (end_row, end_column), self.board))
+                        moves.append(Move((r,c), (end_row, end_column), board))
 
 
     # Get all bishop moves for bishop located in row, col.  Add these moves to list
-    def bishop_moves(self, r, c, moves):
+    def bishop_moves(self, r, c, moves, board = None):
+        if board is None:
+            board = self._decoded_board()
         pinned_piece = False
         pin_direction = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -320,7 +425,7 @@ class GameState():
                 pin_direction = (self.pins[i][2], self.pins[i][3])
                 self.pins.remove(self.pins[i])
                 break
-        
+
         directions = ((-1, -1), (-1, 1), (1, -1), (1, 1))
         opposingColor = "b" if self.white_to_move else "w"
         for d in directions:
@@ -329,11 +434,11 @@ class GameState():
                 end_column = c + d[1] * i
                 if 0 <= end_row < 8 and 0 <= end_column < 8: # on board
                     if not pinned_piece or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        endPiece = self.board[end_row][end_column]
+                        endPiece = board[end_row][end_column]
                         if endPiece == "--": # valid
-                            moves.append(Move((r, c), (end_row, end_column), self.board))
+                            moves.append(Move((r, c), (end_row, end_column), board))
                         elif endPiece[0] == opposingColor: # capture opposing piece
-                            moves.append(Move((r,c), (end_row, end_column), self.board))
+                            moves.append(Move((r,c), (end_row, end_column), board))
                             break
                         else: # friendly fire
                             break
@@ -341,56 +446,72 @@ class GameState():
                     break
 
     # Get all queen moves for queen located in row, col.  Add these moves to list
-    def queen_moves(self, r, c, moves):
-        self.rook_moves(r, c, moves)
-        self.bishop_moves(r, c, moves)
-
-    def king_moves(self, r, c, moves):
+    def queen_moves(self, r, c, moves, board = None):
+        if board is None:
+            board = self._decoded_board()
+        self.rook_moves(r, c, moves, board)
+        self.bishop_moves(r, c, moves, board)
+
+    def king_moves(self, r, c, moves, board = None):
+        if board is None:
+            board = self._decoded_board()
         kingMoves = ((-1,-1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
         sameColor = "w" if self.white_to_move else "b"
         for i in range(8):
             end_row = r + kingMoves[i][0]
             end_column = c + kingMoves[i][1]
             if 0 <= end_row < 8 and 0 <= end_column < 8:
-                endPiece = self.board[end_row][end_column]
+                endPiece = board[end_row][end_column]
                 if endPiece[0] != sameColor:
                     # place king on end square and check for checks
                     if sameColor == "w":
                         self.pos_white_king = (end_row, end_column)
                     else:
                         self.pos_black_king = (end_row, end_column)
-                    in_check, pins, checks = self.check_pins_and_checks()
+                    in_check, pins, checks = self.check_pins_and_checks(board)
                     if not in_check:
-                        moves.append(Move((r,c), (end_row, end_column), self.board))
+                        moves.append(Move((r,c), (end_row, end_column), board))
                     # place king in original location
                     if sameColor == "w":
                         self.pos_white_king = (r, c)
                     else:
                         self.pos_black_king = (r, c)
-        self.castle_moves(r, c, moves, sameColor)
+        self.castle_moves(r, c, moves, sameColor, board)
 
 
-    def castle_moves(self, r, c, moves, sameColor):
-        in_check = self.square_under_attack(r, c, sameColor)
+    def castle_moves(self, r, c, moves, sameColor, board = None):
+        if board is None:
+            board = self._decoded_board()
+        in_check = self.square_under_attack(r, c, sameColor, board)
         if self.in_check:
             return
         if (self.white_to_move and self.wks_castle) or (not self.white_to_move and self.bks_castle):
-            self.ks_castle_moves(r, c, moves, sameColor)
+            self.ks_castle_moves(r, c, moves, sameColor, board)
         if (self.white_to_move and self.wqs_castle) or (not self.white_to_move and self.bqs_castle):
-            self.qs_castle_moves(r, c, moves, sameColor)
+            self.qs_castle_moves(r, c, moves, sameColor, board)
+
+
+    def ks_castle_moves(self, r, c, moves, sameColor, board = None):
+        if board is None:
+            board = self._decoded_board()
+        if board[r][c+1] == "--" and board[r][c+2] == "--" and not self.square_under_attack(r, c+1, sameColor, board) and not self.square_under_attack(r, c+2, sameColor, board):
+            moves.append(Move((r, c), (r, c+2), board, castle = True))
 
-        
-    def ks_castle_moves(self, r, c, moves, sameColor):
-        if self.board[r][c+1] == "--" and self.board[r][c+2] == "--" and not self.square_under_attack(r, c+1, sameColor) and not self.square_under_attack(r, c+2, sameColor):
-            moves.append(Move((r, c), (r, c+2), self.board, castle = True)) 
+    def qs_castle_moves(self, r, c, moves, sameColor, board = None):
+        if board is None:
+            board = self._decoded_board()
+        if board[r][c-1] == "--" and board[r][c-2] == "--" and board[r][c-3] == "--" and not self.square_under_attack(r, c-1, sameColor, board) and not self.square_under_attack(r, c-2, sameColor, board):
+            moves.append(Move((r, c), (r, c-2), board, castle = True))
 
-    def qs_castle_moves(self, r, c, moves, sameColor):
-        if self.board[r][c-1] == "--" and self.board[r][c-2] == "--" and self.board[r][c-3] == "--" and not self.square_under_attack(r, c-1, sameColor) and not self.square_under_attack(r, c-2, sameColor):
-            moves.append(Move((r, c), (r, c-2), self.board, castle = True))
+    # Piece letter -> function adding the moves of that piece, shared by all game states
+    moveFunctions = {'p': pawn_moves, 'R': rook_moves, 'N': knight_moves,
+                     'B': bishop_moves, 'Q': queen_moves, 'K': king_moves}
 
-    
 
-    def square_under_attack(self, r, c, sameColor):
+
+    def square_under_attack(self, r, c, sameColor, board = None):
+        if board is None:
+            board = self._decoded_board()
         # check outward from square
         oppColor = "w" if sameColor == "b" else "b"
         directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
@@ -398,9 +519,9 @@ class GameState():
             d = directions[j]
             for i in range(1, 8):
                 end_row = r + d[0] * i
-                end_column = r + d[1] * i
+                end_column = c + d[1] * i
                 if 0 <= end_row < 8 and 0 <= end_column < 8:
-                    endPiece = self.board[end_row][end_column]
+                    endPiece = board[end_row][end_column]
                     if endPiece[0] == sameColor: # no attack from that direction
                         break
                     elif endPiece[0] == oppColor:
@@ -419,20 +540,22 @@ class GameState():
                             break
                 else:
                     break
-        
+
         # check for knight checks
         knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
         for m in knightMoves:
             end_row = r + m[0]
-            end_column = r + m[1]
+            end_column = c + m[1]
             if 0 <= end_row < 8 and 0 <= end_column < 8:
-                endPiece = self.board[end_row][end_column]
+                endPiece = board[end_row][end_column]
                 if endPiece[0] == oppColor and endPiece[1] == "N":
                     return True
-        
+
         return False
 
-    def check_pins_and_checks(self):
+    def check_pins_and_checks(self, board = None):
+        if board is None:
+            board = self._decoded_board()
         pins = [] # displays square where the ally pinned piece is and the direction it is pinned from
         checks = [] # displays square where opposition is providing a check
         in_check = False
@@ -455,7 +578,7 @@ class GameState():
                 end_row = start_row + d[0] * i
                 end_column = start_column + d[1] * i
                 if 0 <= end_row < 8 and 0 <= end_column < 8:
-                    endPiece = self.board[end_row][end_column]
+                    endPiece = board[end_row][end_column]
                     if endPiece[0] == sameColor and endPiece[1] != "K": # the first ally piece could be a pin (or not)
                         if possiblePin == ():
                             possiblePin = (end_row, end_column, d[0], d[1])
@@ -490,21 +613,13 @@ class GameState():
             end_row = start_row + m[0]
             end_column = start_column + m[1]
             if 0 <= end_row < 8 and 0 <= end_column < 8:
-                endPiece = self.board[end_row][end_column]
+                endPiece = board[end_row][end_column]
                 if endPiece[0] == oppColor and endPiece[1] == "N":
                     in_check = True
                     checks.append((end_row, end_column, m[0], m[1]))
-        
-        return in_check, pins, checks      
 
-class castle_rights():
-    def __init__(self, wks, bks, wqs, bqs):
-        self.wks = wks
-        self.bks = bks
-        self.wqs = wqs
-        self.bqs = bqs
+        return in_check, pins, checks
 
-  
 class Move():
 
     ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0 }
@@ -512,6 +627,9 @@ class Move():
     files_to_cols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
     cols_to_files = {v:k for k, v in files_to_cols.items()}
 
+    __slots__ = ("start_row", "start_column", "end_row", "end_column", "moved_piece", "captured_piece",
+                 "pawn_promotion", "promotion_choice", "en_passant", "castle", "moveID")
+
 
     def __init__(self, startSq, endSq, board, en_passant = False, pawn_promotion = False, castle = False):
         self.start_row = startSq[0]
@@ -522,6 +640,7 @@ class Move():
         self.captured_piece = board[self.end_row][self.end_column]
         # pawn promotion
         self.pawn_promotion = pawn_promotion
+        self.promotion_choice = None # piece type ('Q', 'R', 'B', 'N') the pawn promotes to, set when the move is made
         # En Passant Move
         self.en_passant = en_passant
         if en_passant:
@@ -530,8 +649,16 @@ class Move():
         self.castle = castle
 
         self.moveID = self.start_row * 1000 + self.start_column * 100 + self.end_row * 10 + self.end_column
-        
-    
+
+    # Pickle moves as a plain tuple of their fields
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
     # Overriding the equals method
     def __eq__(self, other):
         if isinstance(other, Move):
@@ -545,4 +672,3 @@ class Move():
         return self.cols_to_files[c] + self.rows_to_ranks[r]
 
 
-
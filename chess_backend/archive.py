@@ -0,0 +1,346 @@
+# Compact binary archive for finished games.  Games are written one after another into a data file and their byte
+# offsets are kept in a separate index file, so any game (or any position inside it) can be found with a single seek.
+#
+# Data file:   MAGIC_DATA, then for every game a header (ply count, result, tag length), the tags as utf-8 text and
+#              one packed 16 bit move per ply.
+# Index file:  MAGIC_INDEX, then one 64 bit offset into the data file per game.
+#
+# A packed move is  from square (6 bits) | to square (6 bits) << 6 | promotion piece (2 bits) << 12 | promotion flag << 14,
+# where a square is row * 8 + column in board coordinates (row 0 is black's back rank).  All numbers are little endian.
+
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from chess_backend.ChessEngine import GameState, Move
+
+MAGIC_DATA = b"CHGA\x01\x00\x00\x00"
+MAGIC_INDEX = b"CHGI\x01\x00\x00\x00"
+GAME_HEADER = struct.Struct("<IBxH") # plies, result, padding, length of the tags
+OFFSET = struct.Struct("<Q")
+
+PROMOTION_PIECES = "QRBN"
+PROMOTION_FLAG = 1 << 14
+RESULTS = ["*", "1-0", "0-1", "1/2-1/2"]
+
+
+# Pack a move into 16 bits
+def pack_move(move):
+    packed = (move.start_row * 8 + move.start_column) | (move.end_row * 8 + move.end_column) << 6
+    if move.pawn_promotion:
+        packed |= PROMOTION_PIECES.index(move.promotion_choice or "Q") << 12 | PROMOTION_FLAG
+    return packed
+
+# Unpack a move into ((start_row, start_column), (end_row, end_column), promotion piece)
+def unpack_move(packed):
+    start = packed & 0x3F
+    end = (packed >> 6) & 0x3F
+    return (start >> 3, start & 7), (end >> 3, end & 7), PROMOTION_PIECES[(packed >> 12) & 3]
+
+# Find the legal move matching a packed move and play it on the game state.  Raises ValueError if the move is illegal.
+def play_packed_move(gs, packed):
+    startSq, endSq, promotion = unpack_move(packed)
+    for move in gs.valid_moves():
+        if (move.start_row, move.start_column) == startSq and (move.end_row, move.end_column) == endSq:
+            if move.pawn_promotion:
+                move.promotion_choice = promotion
+            gs.makeMove(move)
+            return move
+    raise ValueError("illegal move %s%s in archived game" % (square_name(*startSq), square_name(*endSq)))
+
+# Play a packed move from an archived game without generating the legal moves first.  Archived games were verified
+# when they were written, so this is only used for replaying them.
+def apply_packed_move(gs, packed):
+    startSq, endSq, promotion = unpack_move(packed)
+    piece = gs.piece_at(*startSq)
+    pawn = piece[1] == 'p'
+    move = Move(startSq, endSq, gs.board,
+                en_passant = pawn and startSq[1] != endSq[1] and gs.piece_at(*endSq) == "--",
+                pawn_promotion = pawn and endSq[0] in (0, 7),
+                castle = piece[1] == 'K' and abs(endSq[1] - startSq[1]) == 2)
+    if move.pawn_promotion:
+        move.promotion_choice = promotion
+    gs.makeMove(move)
+    return move
+
+def square_name(r, c):
+    return "abcdefgh"[c] + str(8 - r)
+
+def _index_path(path):
+    return path + ".idx"
+
+def _encode_tags(tags):
+    return "".join("%s\t%s\n" % (k, v) for k, v in (tags or {}).items()).encode("utf-8")
+
+def _decode_tags(raw):
+    tags = {}
+    for line in bytes(raw).decode("utf-8").splitlines():
+        k, _, v = line.partition("\t")
+        tags[k] = v
+    return tags
+
+
+# Appends games to an archive, creating it if needed.  Every game is replayed with makeMove before it is written so
+# only legal games end up in the archive.  Index entries are held back until the data they point to has been flushed,
+# so an interrupted write never leaves offsets past the end of the data file.
+class ArchiveWriter():
+
+    INDEX_BATCH = 1024 # index entries written per flush of the data file
+
+    def __init__(self, path):
+        self.path = path
+        self.data = self._open(path, MAGIC_DATA)
+        try:
+            self.index = self._open(_index_path(path), MAGIC_INDEX)
+        except ValueError:
+            self.data.close()
+            raise
+        self.count = (self.index.tell() - len(MAGIC_INDEX)) // OFFSET.size
+        self.pending = [] # packed offsets not written to the index yet
+
+    # Open a file for appending, writing the magic if it is new and checking it otherwise
+    def _open(self, path, magic):
+        f = open(path, "a+b")
+        f.seek(0)
+        header = f.read(len(magic))
+        if header and header != magic:
+            f.close()
+            raise ValueError("%s is not a game archive" % path)
+        f.seek(0, os.SEEK_END)
+        if not header:
+            f.write(magic)
+        return f
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Write the moves in gs.moveLog as a new game and return its game id.  Pass verified = True if the moves were
+    # already checked against valid_moves (e.g. the game was just replayed from PGN) to skip replaying it again.
+    def append_game(self, gs, result = "*", tags = None, verified = False):
+        return self.append_packed([pack_move(move) for move in gs.moveLog], result, tags, verified)
+
+    # Write a game given as a list of packed moves and return its game id
+    def append_packed(self, packed_moves, result = "*", tags = None, verified = False):
+        if not verified:
+            verify = GameState()
+            for packed in packed_moves:
+                play_packed_move(verify, packed)
+        rawTags = _encode_tags(tags)
+        if len(rawTags) > 0xFFFF:
+            raise ValueError("tags of a game can be at most 65535 bytes, got %d" % len(rawTags))
+        offset = self.data.tell()
+        self.data.write(GAME_HEADER.pack(len(packed_moves), RESULTS.index(result), len(rawTags)))
+        self.data.write(rawTags)
+        self.data.write(struct.pack("<%dH" % len(packed_moves), *packed_moves))
+        self.pending.append(OFFSET.pack(offset))
+        if len(self.pending) >= self.INDEX_BATCH:
+            self.flush()
+        self.count += 1
+        return self.count - 1
+
+    # Bulk append (game state, result, tags) tuples, returns the list of game ids
+    def append_games(self, games):
+        return [self.append_game(*game) for game in games]
+
+    # Write the pending index entries, after the data they point to is on disk
+    def flush(self):
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        self.index.write(b"".join(self.pending))
+        self.index.flush()
+        self.pending = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.data.close()
+            self.index.close()
+
+
+# Read only, memory mapped view of an archive.  moves_view returns moves straight out of the mapping without copying.
+class ArchiveReader():
+
+    def __init__(self, path):
+        self.path = path
+        self._files = []
+        self.data = self._map(path, MAGIC_DATA)
+        self.index = self._map(_index_path(path), MAGIC_INDEX)
+        self.offsets = self.index[len(MAGIC_INDEX):].cast("B").cast("Q")
+
+    def _map(self, path, magic):
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size <= len(magic):
+            return memoryview(magic) # empty archive, nothing to map
+        mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self._files.append(mm)
+        if mm[:len(magic)] != magic:
+            raise ValueError("%s is not a game archive" % path)
+        return memoryview(mm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _header(self, game_id):
+        offset = self.offsets[game_id] if sys.byteorder == "little" else OFFSET.unpack_from(self.index, len(MAGIC_INDEX) + game_id * OFFSET.size)[0]
+        plies, result, tagLength = GAME_HEADER.unpack_from(self.data, offset)
+        return offset + GAME_HEADER.size, plies, result, tagLength
+
+    # The packed moves of a game as an array of ints
+    def moves(self, game_id):
+        moves = array("H")
+        moves.frombytes(self._raw_moves(game_id))
+        if sys.byteorder != "little":
+            moves.byteswap()
+        return moves
+
+    # The packed moves of a game as a sequence of ints without copying them out of the mapping where possible.  The
+    # result is only valid while the reader is open.
+    def moves_view(self, game_id):
+        raw = self._raw_moves(game_id)
+        if sys.byteorder == "little":
+            return raw.cast("H")
+        return struct.unpack("<%dH" % (len(raw) // 2), raw)
+
+    def _raw_moves(self, game_id):
+        start, plies, _, tagLength = self._header(game_id)
+        start += tagLength
+        return self.data[start:start + plies * 2]
+
+    def result(self, game_id):
+        return RESULTS[self._header(game_id)[2]]
+
+    def tags(self, game_id):
+        start, _, _, tagLength = self._header(game_id)
+        return _decode_tags(self.data[start:start + tagLength])
+
+    # Replay a game up to ply (the whole game if ply is None) and return the resulting GameState
+    def position(self, game_id, ply = None):
+        moves = self.moves_view(game_id)
+        gs = GameState()
+        for packed in moves[:len(moves) if ply is None else ply]:
+            apply_packed_move(gs, packed)
+        return gs
+
+    def game(self, game_id):
+        return self.position(game_id)
+
+    def close(self):
+        for handle in [self.offsets, self.data, self.index] + self._files[::-1]:
+            try:
+                if isinstance(handle, memoryview):
+                    handle.release()
+                else:
+                    handle.close()
+            except BufferError: # a moves_view result is still alive, the mapping is unmapped once it is dropped
+                pass
+
+
+# --- PGN conversion ---
+
+SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*$")
+TAG = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+MOVETEXT_NOISE = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|\d+\.(?:\.\.)?")
+
+
+# Find the legal move for a move in standard algebraic notation and play it on the game state
+def play_san(gs, san):
+    moves = gs.valid_moves()
+    castle = san.rstrip("+#!?").replace("0", "O")
+    if castle in ("O-O", "O-O-O"):
+        endColumn = 6 if castle == "O-O" else 2
+        for move in moves:
+            if move.castle and move.end_column == endColumn:
+                gs.makeMove(move)
+                return move
+        raise ValueError("illegal castle %s" % san)
+
+    match = SAN.match(san)
+    if match is None:
+        raise ValueError("cannot parse move %s" % san)
+    piece, fromFile, fromRank, target, promotion = match.groups()
+    piece = piece or "p"
+    candidates = [move for move in moves
+                  if move.moved_piece[1] == piece and move.GetRankFile(move.end_row, move.end_column) == target
+                  and (fromFile is None or move.cols_to_files[move.start_column] == fromFile)
+                  and (fromRank is None or move.rows_to_ranks[move.start_row] == fromRank)]
+    if len(candidates) != 1:
+        raise ValueError("%s move %s" % ("illegal" if not candidates else "ambiguous", san))
+    move = candidates[0]
+    if move.pawn_promotion:
+        move.promotion_choice = promotion or "Q"
+    gs.makeMove(move)
+    return move
+
+# Yield (tags, list of SAN moves, result) for every game in an iterable of PGN lines, e.g. an open file.  Raises
+# ValueError on a game whose movetext cannot be parsed.
+def read_pgn(lines):
+    for tags, movetext in _split_pgn(lines):
+        yield _parse_movetext(tags, movetext)
+
+# Yield (tags, raw movetext) for every game in an iterable of PGN lines
+def _split_pgn(lines):
+    tags = {}
+    movetext = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith("["):
+            if movetext:
+                yield tags, " ".join(movetext)
+                tags, movetext = {}, []
+            match = TAG.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2)
+        elif line and not line.startswith("%"):
+            movetext.append(line)
+    if movetext:
+        yield tags, " ".join(movetext)
+
+def _parse_movetext(tags, movetext):
+    movetext = MOVETEXT_NOISE.sub(" ", movetext)
+    # strip (possibly nested) variations, innermost first
+    replaced = 1
+    while replaced:
+        movetext, replaced = re.subn(r"\([^()]*\)", " ", movetext)
+    if "(" in movetext or ")" in movetext:
+        raise ValueError("unbalanced variation in movetext")
+    result = tags.get("Result", "*")
+    sans = []
+    for token in movetext.split():
+        if token in RESULTS:
+            result = token
+        else:
+            sans.append(token)
+    return tags, sans, result if result in RESULTS else "*"
+
+# Convert every game of a PGN file into packed games appended to an archive.  Games with illegal or unreadable moves
+# or unbalanced variations are skipped.  Returns (games written, games skipped).
+def pgn_to_archive(pgn_path, archive_path):
+    written = skipped = 0
+    with open(pgn_path, encoding = "utf-8", errors = "replace") as f, ArchiveWriter(archive_path) as writer:
+        for tags, movetext in _split_pgn(f):
+            gs = GameState()
+            try:
+                tags, sans, result = _parse_movetext(tags, movetext)
+                for san in sans:
+                    play_san(gs, san)
+                tags.pop("Result", None)
+                writer.append_game(gs, result, tags, verified = True)
+            except ValueError:
+                skipped += 1
+                continue
+            written += 1
+    return written, skipped
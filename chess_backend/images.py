@@ -0,0 +1,30 @@
+# Piece images for the UI.  Images are only decoded the first time a piece is drawn and every scaled size is cached,
+# so resizing the board rescales each image once instead of reloading it.  pygame is imported lazily so the engine
+# can be used without it.
+
+import os
+from functools import lru_cache
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images_chess")
+DEFAULT_SET = "set_1"
+
+
+# Decoded image of a piece at its original size
+@lru_cache(maxsize = None)
+def _load_piece(piece, piece_set):
+    import pygame
+    image = pygame.image.load(os.path.join(IMAGES_DIR, piece_set, piece + ".png"))
+    if pygame.display.get_surface() is not None: # converting needs a display, it makes blitting much faster
+        image = image.convert_alpha()
+    return image
+
+# Image of a piece (e.g. "wK") scaled to size x size pixels
+@lru_cache(maxsize = None)
+def piece_image(piece, size, piece_set = DEFAULT_SET):
+    import pygame
+    return pygame.transform.scale(_load_piece(piece, piece_set), (size, size))
+
+# Forget all loaded images, e.g. after switching display modes
+def clear_cache():
+    piece_image.cache_clear()
+    _load_piece.cache_clear()
@@ -0,0 +1,302 @@
+# Position search over a game archive (see archive.py).  Every archived game is replayed once and each position is
+# recorded under three keys:
+#
+#   position  - zobrist hash of the board, side to move, castling rights and en passant file (only when a capture
+#               en passant is actually possible, so transpositions get the same key)
+#   material  - count of every piece type, 4 bits each
+#   pawns     - zobrist hash of the pawns only
+#
+# Each kind gets its own index file: INDEX_MAGIC followed by fixed size records (key, game id, ply, next move) sorted
+# by key.  Queries memory map the file and binary search it, so nothing has to be loaded into RAM.  Building the index
+# replays games in parallel worker processes and merges their sorted runs on disk.
+
+import heapq
+import mmap
+import multiprocessing
+import os
+import random
+import shutil
+import struct
+import tempfile
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from chess_backend.archive import ArchiveReader, PROMOTION_FLAG, apply_packed_move, unpack_move, square_name
+from chess_backend.ChessEngine import GameState
+
+INDEX_MAGIC = b"CHPI\x01\x00\x00\x00"
+RECORD = struct.Struct("<QIHH") # key, game id, ply, packed next move (NO_MOVE at the end of the game)
+NO_MOVE = 0 # a8a8 is never a legal move
+KINDS = ("position", "material", "pawns")
+
+PIECES = ["wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK"]
+MATERIAL_PIECES = "PNBRQpnbrq"
+
+# Zobrist keys.  The seed is fixed so keys are the same in every process and every run.
+_rng = random.Random(0x5EED)
+ZOBRIST_PIECES = {piece: [_rng.getrandbits(64) for sq in range(64)] for piece in PIECES}
+ZOBRIST_BLACK_TO_MOVE = _rng.getrandbits(64)
+ZOBRIST_CASTLE = [_rng.getrandbits(64) for i in range(4)]
+ZOBRIST_EN_PASSANT = [_rng.getrandbits(64) for c in range(8)]
+
+
+# Position key of a game state
+def position_key(gs):
+    key = 0
+    for r in range(8):
+        for c in range(8):
+            piece = gs.piece_at(r, c)
+            if piece != "--":
+                key ^= ZOBRIST_PIECES[piece][r * 8 + c]
+    if not gs.white_to_move:
+        key ^= ZOBRIST_BLACK_TO_MOVE
+    for i, right in enumerate((gs.wks_castle, gs.wqs_castle, gs.bks_castle, gs.bqs_castle)):
+        if right:
+            key ^= ZOBRIST_CASTLE[i]
+    if gs.en_passant_possible != () and _can_capture_en_passant(gs):
+        key ^= ZOBRIST_EN_PASSANT[gs.en_passant_possible[1]]
+    return key
+
+# Whether a pawn of the side to move stands next to the pawn that just moved two squares
+def _can_capture_en_passant(gs):
+    r, c = gs.en_passant_possible
+    pawnRow, pawn = (r + 1, "wp") if gs.white_to_move else (r - 1, "bp")
+    return any(0 <= col < 8 and gs.piece_at(pawnRow, col) == pawn for col in (c - 1, c + 1))
+
+# Pawn structure key of a game state
+def pawn_key(gs):
+    key = 0
+    for r in range(1, 7):
+        for c in range(8):
+            piece = gs.piece_at(r, c)
+            if piece[1] == "p":
+                key ^= ZOBRIST_PIECES[piece][r * 8 + c]
+    return key
+
+# Material signature of a game state
+def material_key(gs):
+    counts = Counter(gs.piece_at(r, c) for r in range(8) for c in range(8))
+    return _pack_material(counts[("w" if letter.isupper() else "b") + letter.upper().replace("P", "p")]
+                          for letter in MATERIAL_PIECES)
+
+# Material signature from a string of piece letters, white upper case and black lower case.  Kings are ignored,
+# e.g. "KRPkr" is king, rook and pawn against king and rook.
+def material_key_from_string(text):
+    counts = Counter(text)
+    return _pack_material(counts[letter] for letter in MATERIAL_PIECES)
+
+def _pack_material(counts):
+    key = 0
+    for i, count in enumerate(counts):
+        key |= min(count, 15) << (4 * i)
+    return key
+
+def index_path(base, kind):
+    return "%s.%s" % (base, kind)
+
+
+# --- Building ---
+
+_worker_archive = None
+
+def _open_worker_archive(archive_path):
+    global _worker_archive
+    if _worker_archive is None or _worker_archive.path != archive_path:
+        _close_worker_archive()
+        _worker_archive = ArchiveReader(archive_path)
+    return _worker_archive
+
+def _close_worker_archive():
+    global _worker_archive
+    if _worker_archive is not None:
+        _worker_archive.close()
+        _worker_archive = None
+
+# Replay the games first..last-1 and write one sorted run file per kind.  Runs in a worker process.
+def _index_games(args):
+    archive_path, first, last, run_dir = args
+    archive = _open_worker_archive(archive_path)
+    records = {kind: [] for kind in KINDS}
+    for game_id in range(first, last):
+        moves = archive.moves_view(game_id)
+        gs = GameState()
+        seenMaterial = set()
+        seenPawns = set()
+        for ply in range(len(moves) + 1):
+            nextMove = moves[ply] if ply < len(moves) else NO_MOVE
+            records["position"].append((position_key(gs), game_id, ply, nextMove))
+            # material and pawn structure only need to be found once per game
+            key = material_key(gs)
+            if key not in seenMaterial:
+                seenMaterial.add(key)
+                records["material"].append((key, game_id, ply, nextMove))
+            key = pawn_key(gs)
+            if key not in seenPawns:
+                seenPawns.add(key)
+                records["pawns"].append((key, game_id, ply, nextMove))
+            if nextMove != NO_MOVE:
+                apply_packed_move(gs, nextMove)
+    runs = {}
+    for kind in KINDS:
+        records[kind].sort()
+        runs[kind] = os.path.join(run_dir, "%s-%d.run" % (kind, first))
+        _write_records(runs[kind], records[kind], magic = b"")
+    return runs
+
+def _write_records(path, records, magic = INDEX_MAGIC):
+    with open(path, "wb") as f:
+        f.write(magic)
+        batch = []
+        for record in records:
+            batch.append(RECORD.pack(*record))
+            if len(batch) == 4096:
+                f.write(b"".join(batch))
+                batch = []
+        f.write(b"".join(batch))
+
+def _read_records(path):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(RECORD.size * 4096)
+            if not block:
+                break
+            yield from RECORD.iter_unpack(block)
+
+# Merge sorted run files into one, at most fan_in files at a time so huge builds don't run out of file handles
+def _merge_runs(runs, out_path, run_dir, fan_in = 64):
+    generation = 0
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            path = os.path.join(run_dir, "merge-%d-%d.run" % (generation, i))
+            _write_records(path, heapq.merge(*(_read_records(run) for run in runs[i:i + fan_in])), magic = b"")
+            for run in runs[i:i + fan_in]:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+        generation += 1
+    _write_records(out_path, heapq.merge(*(_read_records(run) for run in runs)))
+
+# Build the position, material and pawn indexes for an archive.  Games are replayed in chunks of chunk_games by
+# worker processes (all cores if workers is None), so memory use is bounded by the chunk size and not the archive size.
+def build_position_index(archive_path, base_path = None, workers = None, chunk_games = 2000, fan_in = 64):
+    base_path = base_path or archive_path
+    with ArchiveReader(archive_path) as archive:
+        numGames = len(archive)
+    run_dir = tempfile.mkdtemp(prefix = "chess-index-", dir = os.path.dirname(os.path.abspath(base_path)))
+    try:
+        jobs = [(archive_path, first, min(first + chunk_games, numGames), run_dir)
+                for first in range(0, numGames, chunk_games)]
+        if workers == 1:
+            try:
+                _merge_results(map(_index_games, jobs), base_path, run_dir, fan_in)
+            finally:
+                _close_worker_archive()
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                _merge_results(pool.imap_unordered(_index_games, jobs), base_path, run_dir, fan_in)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors = True)
+    return numGames
+
+# Collect the run files of all chunks and merge them into one index file per kind
+def _merge_results(results, base_path, run_dir, fan_in):
+    runs = {kind: [] for kind in KINDS}
+    for result in results:
+        for kind in KINDS:
+            runs[kind].append(result[kind])
+    for kind in KINDS:
+        _merge_runs(sorted(runs[kind]), index_path(base_path, kind), run_dir, fan_in)
+
+
+# --- Querying ---
+
+# One memory mapped index file
+class _SortedIndex():
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = None
+        if os.fstat(self.file.fileno()).st_size > len(INDEX_MAGIC):
+            self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        header = self.map[:len(INDEX_MAGIC)] if self.map is not None else self.file.read()
+        if header != INDEX_MAGIC:
+            raise ValueError("%s is not a position index" % path)
+        self.count = (len(self.map) - len(INDEX_MAGIC)) // RECORD.size if self.map is not None else 0
+        self.keys = _RecordKeys(self.map, self.count)
+
+    # All (key, game id, ply, next move) records with the given key
+    def lookup(self, key):
+        first = bisect_left(self.keys, key)
+        last = bisect_right(self.keys, key, first)
+        return [RECORD.unpack_from(self.map, len(INDEX_MAGIC) + i * RECORD.size) for i in range(first, last)]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+# Sequence view of the keys in an index file for bisect
+class _RecordKeys():
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from("<Q", self.buffer, len(INDEX_MAGIC) + i * RECORD.size)[0]
+
+
+# Query interface over the indexes built by build_position_index.  Positions can be given as a GameState or a key.
+class PositionIndex():
+
+    def __init__(self, base_path):
+        self.indexes = {kind: _SortedIndex(index_path(base_path, kind)) for kind in KINDS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Sorted ids of the games that reached the position
+    def games(self, position):
+        return self._games("position", position, position_key)
+
+    # Sorted ids of the games that reached the material balance (GameState, key or string such as "KRPkr")
+    def games_with_material(self, material):
+        if isinstance(material, str):
+            material = material_key_from_string(material)
+        return self._games("material", material, material_key)
+
+    # Sorted ids of the games that reached the pawn structure
+    def games_with_pawns(self, position):
+        return self._games("pawns", position, pawn_key)
+
+    # How often each move was played from the position, as a list of (move, count) with the most popular first.
+    # Moves are in the same from-square to-square notation as Move.GetChessNotation, with "=" and the piece added
+    # for promotions (e.g. "e7e8=N").
+    def next_moves(self, position):
+        counts = Counter()
+        for key, game_id, ply, packed in self._lookup("position", position, position_key):
+            if packed != NO_MOVE:
+                startSq, endSq, promotion = unpack_move(packed)
+                notation = square_name(*startSq) + square_name(*endSq)
+                if packed & PROMOTION_FLAG:
+                    notation += "=" + promotion
+                counts[notation] += 1
+        return counts.most_common()
+
+    def _lookup(self, kind, position, key_function):
+        key = key_function(position) if isinstance(position, GameState) else position
+        return self.indexes[kind].lookup(key)
+
+    def _games(self, kind, position, key_function):
+        return sorted({record[1] for record in self._lookup(kind, position, key_function)})
+
+    def close(self):
+        for index in self.indexes.values():
+            index.close()
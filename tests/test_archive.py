@@ -0,0 +1,131 @@
+import pytest
+
+from chess_backend.archive import ArchiveReader, ArchiveWriter, pack_move, pgn_to_archive, play_san, read_pgn, unpack_move
+from chess_backend.ChessEngine import GameState
+
+# en passant, under-promotion and castling on both sides
+SPECIAL_MOVES = "e4 Nf6 e5 d5 exd6 e5 dxc7 Qe7 cxb8=N Rxb8 Nf3 g6 Bc4 Bg7 O-O O-O".split()
+
+PGN = """[Event "Special"]
+[Result "1-0"]
+
+1. e4 Nf6 2. e5 d5 3. exd6 {en passant} e5 4. dxc7 Qe7 5. cxb8=N $1 Rxb8
+(5... Qxb8?! 6. d4) 6. Nf3 g6 7. Bc4 Bg7 8. O-O O-O ; both castled
+1-0
+
+[Event "Bad"]
+
+1. e4 e5 2. Ke3 Nc6 *
+
+[Event "Short"]
+[White "A"]
+
+1. d4 d5 1/2-1/2
+
+[Event "Truncated"]
+
+1. e4 (1. d4 e5 2.
+c4 *
+"""
+
+
+def play(sans):
+    gs = GameState()
+    for san in sans:
+        play_san(gs, san)
+    return gs
+
+def boards_equal(a, b):
+    return [list(row) for row in a.board] == [list(row) for row in b.board]
+
+
+def test_pack_move_round_trip():
+    gs = play(SPECIAL_MOVES)
+    for move in gs.moveLog:
+        startSq, endSq, promotion = unpack_move(pack_move(move))
+        assert startSq == (move.start_row, move.start_column)
+        assert endSq == (move.end_row, move.end_column)
+        if move.pawn_promotion:
+            assert promotion == move.promotion_choice == "N"
+
+def test_write_and_read_games(tmp_path):
+    path = str(tmp_path / "games.bin")
+    gs = play(SPECIAL_MOVES)
+    with ArchiveWriter(path) as writer:
+        assert writer.append_games([(GameState(), "*", None), (gs, "1-0", {"White": "A"})]) == [0, 1]
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 2
+        assert list(reader.moves(0)) == []
+        assert list(reader.moves(1)) == [pack_move(move) for move in gs.moveLog]
+        assert reader.result(1) == "1-0"
+        assert reader.tags(1) == {"White": "A"}
+        assert boards_equal(reader.game(1), gs)
+        assert boards_equal(reader.position(1, 10), play(SPECIAL_MOVES[:10]))
+        assert reader.game(1).piece_at(0, 1) == "bR" # the promoted knight was taken back on b8
+
+def test_moves_outlive_reader(tmp_path):
+    path = str(tmp_path / "games.bin")
+    with ArchiveWriter(path) as writer:
+        writer.append_game(play(["e4", "e5"]))
+    with ArchiveReader(path) as reader:
+        moves = reader.moves(0)
+        view = reader.moves_view(0)
+    assert len(moves) == 2
+    del view
+
+def test_illegal_game_is_rejected(tmp_path):
+    path = str(tmp_path / "games.bin")
+    e2e5 = 6 * 8 + 4 | (3 * 8 + 4) << 6
+    with ArchiveWriter(path) as writer:
+        with pytest.raises(ValueError):
+            writer.append_packed([e2e5])
+        with pytest.raises(ValueError):
+            writer.append_game(GameState(), tags = {"Annotator": "x" * 70000})
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 0
+
+def test_writer_checks_magic(tmp_path):
+    path = tmp_path / "games.bin"
+    path.write_bytes(b"not an archive")
+    with pytest.raises(ValueError):
+        ArchiveWriter(str(path))
+    assert path.read_bytes() == b"not an archive"
+
+def test_index_only_points_at_flushed_data(tmp_path):
+    path = str(tmp_path / "games.bin")
+    writer = ArchiveWriter(path)
+    writer.INDEX_BATCH = 2
+    for i in range(3):
+        writer.append_game(play(["e4", "e5"]))
+    # the third entry is still pending, the first two only point at data already on disk
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 2
+        assert [len(reader.moves(i)) for i in range(2)] == [2, 2]
+    writer.close()
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 3
+    with ArchiveWriter(path) as writer:
+        assert writer.append_game(GameState()) == 3
+
+def test_read_pgn_strips_comments_and_variations():
+    games = list(read_pgn(PGN.split("[Event \"Truncated\"]")[0].splitlines()))
+    assert [len(sans) for tags, sans, result in games] == [16, 4, 2]
+    assert games[0][1] == SPECIAL_MOVES
+    assert [result for tags, sans, result in games] == ["1-0", "*", "1/2-1/2"]
+
+def test_unbalanced_variation_is_rejected():
+    with pytest.raises(ValueError):
+        list(read_pgn(["1. e4 (1. d4 e5 2.", "c4 *"]))
+    with pytest.raises(ValueError):
+        list(read_pgn(["1. e4 e5) 2. Nf3 *"]))
+
+def test_pgn_to_archive_skips_bad_games(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_text(PGN)
+    path = str(tmp_path / "games.bin")
+    assert pgn_to_archive(str(pgn), path) == (2, 2)
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 2
+        assert boards_equal(reader.game(0), play(SPECIAL_MOVES))
+        assert reader.tags(1) == {"Event": "Short", "White": "A"}
+        assert reader.result(1) == "1/2-1/2"
@@ -0,0 +1,76 @@
+import pickle
+
+import pytest
+
+from chess_backend.archive import play_san
+from chess_backend.ChessEngine import GameState
+
+# en passant, under-promotion and castling on both sides
+SPECIAL_MOVES = "e4 Nf6 e5 d5 exd6 e5 dxc7 Qe7 cxb8=N Rxb8 Nf3 g6 Bc4 Bg7 O-O O-O".split()
+
+
+def play(sans):
+    gs = GameState()
+    for san in sans:
+        play_san(gs, san)
+    return gs
+
+def state(gs):
+    return ([list(row) for row in gs.board], gs.white_to_move,
+            (gs.wks_castle, gs.wqs_castle, gs.bks_castle, gs.bqs_castle), gs.en_passant_possible,
+            [move.moveID for move in gs.moveLog], gs.pos_white_king, gs.pos_black_king)
+
+
+@pytest.mark.parametrize("moves", [[], ["e4", "Nf6", "e5", "d5"], SPECIAL_MOVES])
+def test_pickle_round_trip(moves):
+    gs = play(moves)
+    loaded = pickle.loads(pickle.dumps(gs))
+    assert state(loaded) == state(gs)
+    assert [move.promotion_choice for move in loaded.moveLog] == [move.promotion_choice for move in gs.moveLog]
+    # the loaded game keeps working, including undoing moves made before pickling
+    assert [move.moveID for move in loaded.valid_moves()] == [move.moveID for move in gs.valid_moves()]
+    for i in range(len(moves)):
+        loaded.undoMove()
+    assert state(loaded) == state(GameState())
+
+def test_copy_is_independent():
+    gs = play(["e4", "Nf6", "e5", "d5"])
+    copied = gs.copy()
+    assert state(copied) == state(gs)
+    assert copied.en_passant_possible == (2, 3)
+    play_san(copied, "exd6")
+    assert state(gs) == state(play(["e4", "Nf6", "e5", "d5"]))
+    copied.undoMove()
+    assert state(copied) == state(gs)
+
+def test_restore_snapshot():
+    gs = play(SPECIAL_MOVES[:6])
+    snapshot = gs.snapshot()
+    expected = state(gs)
+    for san in SPECIAL_MOVES[6:]:
+        play_san(gs, san)
+    for i in range(4):
+        gs.undoMove()
+    play_san(gs, "Be2")
+    gs.restore(snapshot)
+    assert state(gs) == expected
+    for san in SPECIAL_MOVES[6:]:
+        play_san(gs, san)
+    assert state(gs) == state(play(SPECIAL_MOVES))
+
+def test_board_is_read_only():
+    gs = GameState()
+    with pytest.raises(TypeError):
+        gs.board[0][0] = "wK"
+    gs.valid_moves()
+    with pytest.raises(TypeError):
+        gs.board[7][4] = "--"
+    assert gs.board[0][0] == "bR"
+    assert gs.board[7][4] == "wK"
+
+def test_undo_restores_castle_rights():
+    gs = play(["e4", "e5", "Ke2"])
+    assert not gs.wks_castle and not gs.wqs_castle
+    gs.undoMove()
+    assert (gs.wks_castle, gs.wqs_castle, gs.bks_castle, gs.bqs_castle) == (True, True, True, True)
+    assert gs.castle_rightsLog == play(["e4", "e5"]).castle_rightsLog
@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+
+import pytest
+
+from chess_backend.archive import ArchiveReader, ArchiveWriter, play_san
+from chess_backend.ChessEngine import GameState
+from chess_backend.position_index import (PositionIndex, build_position_index, material_key, pawn_key,
+                                          position_key)
+
+GAMES = [
+    "e4 Nf6 Nf3",
+    "Nf3 Nf6 e4", # transposes into the game above
+    "e4 Nf6 e5 d5 exd6 e5 dxc7 Qe7 cxb8=N Rxb8 Nf3 g6 Bc4 Bg7 O-O O-O",
+    "e4 Nf6 e5 d5 exd6 e5 dxc7 Qe7 cxb8=Q Rxb8",
+    "d4 d5 c4 e6 Nc3 Nf6",
+    "d4 Nf6 c4 e6 Nc3 d5",
+    "e4 e5 Nf3 Nc6 Bb5 a6",
+]
+
+
+def play(sans):
+    gs = GameState()
+    for san in sans.split():
+        play_san(gs, san)
+    return gs
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / "games.bin")
+    with ArchiveWriter(path) as writer:
+        for game in GAMES:
+            writer.append_game(play(game))
+    return path
+
+# Replay every game and collect what the index should return for each key
+def brute_force(path):
+    positions, material, pawns = defaultdict(set), defaultdict(set), defaultdict(set)
+    nextMoves = defaultdict(Counter)
+    with ArchiveReader(path) as reader:
+        for game_id in range(len(reader)):
+            gs = GameState()
+            moves = reader.moves(game_id)
+            for ply in range(len(moves) + 1):
+                key = position_key(gs)
+                positions[key].add(game_id)
+                material[material_key(gs)].add(game_id)
+                pawns[pawn_key(gs)].add(game_id)
+                if ply < len(moves):
+                    move = reader.position(game_id, ply + 1).moveLog[-1]
+                    notation = move.GetChessNotation() + ("=" + move.promotion_choice if move.pawn_promotion else "")
+                    nextMoves[key][notation] += 1
+                    gs = reader.position(game_id, ply + 1)
+    return positions, material, pawns, nextMoves
+
+@pytest.mark.parametrize("workers, chunk_games, fan_in", [(1, 2000, 64), (1, 1, 2), (2, 2, 2)])
+def test_index_matches_brute_force(archive, workers, chunk_games, fan_in):
+    assert build_position_index(archive, workers = workers, chunk_games = chunk_games, fan_in = fan_in) == len(GAMES)
+    positions, material, pawns, nextMoves = brute_force(archive)
+    with PositionIndex(archive) as index:
+        for key, games in positions.items():
+            assert index.games(key) == sorted(games)
+            assert Counter(dict(index.next_moves(key))) == nextMoves[key]
+        for key, games in material.items():
+            assert index.games_with_material(key) == sorted(games)
+        for key, games in pawns.items():
+            assert index.games_with_pawns(key) == sorted(games)
+        assert index.games(12345) == []
+
+def test_transpositions_share_a_key():
+    assert position_key(play("e4 Nf6 Nf3")) == position_key(play("Nf3 Nf6 e4"))
+    assert position_key(play("d4 d5 c4 e6 Nc3 Nf6")) == position_key(play("d4 Nf6 c4 e6 Nc3 d5"))
+    # en passant is only part of the key when the capture is possible
+    assert position_key(play("e4 Nf6 e5 d5")) != position_key(play("e4 d5 e5 Nf6"))
+
+def test_queries(archive):
+    build_position_index(archive, workers = 1)
+    with PositionIndex(archive) as index:
+        assert index.games(GameState()) == list(range(len(GAMES)))
+        assert index.games(play("e4 Nf6 Nf3")) == [0, 1]
+        assert index.next_moves(play("e4 Nf6 e5 d5 exd6 e5 dxc7 Qe7")) == [("c7b8=N", 1), ("c7b8=Q", 1)]
+        assert index.games_with_material("KQRRBBNNPPPPPPPkqrrbbnpppppp") == [2, 3]
+        assert index.games_with_pawns(play("d4 d5 c4 e6")) == [4, 5]